@@ -18,6 +18,7 @@ import (
 	"os/signal"
 	"path/filepath"
 	"strconv"
+	"strings"
 	"syscall"
 	"time"
 
@@ -45,17 +46,27 @@ type GTINData struct {
 }
 
 type KIZRequestData struct {
-	GTINData []GTINData `json:"gtin_data"`
-	INN      string     `json:"inn"`
+	GTINData     []GTINData `json:"gtin_data"`
+	INN          string     `json:"inn"`
+	PreviewLimit int        `json:"preview_limit,omitempty"`
 }
 
 type KIZResponse struct {
 	Status    string   `json:"status"`
 	Message   string   `json:"message"`
 	KIZs      []string `json:"kizs,omitempty"`
+	Count     int      `json:"count,omitempty"`
+	Preview   []string `json:"preview,omitempty"`
+	FileURL   string   `json:"file_url,omitempty"`
 	FilePaths []string `json:"file_paths,omitempty"`
 }
 
+// Префикс URL для скачивания сгенерированных файлов с кодами маркировки
+const kizFilesPath = "/api/v1/kizs/files/"
+
+// Каталог, в который записываются и из которого отдаются файлы с кодами маркировки
+const kizFilesDir = "./temp"
+
 type PaymentRequestData struct {
 	Amount  float64 `json:"amount"`
 	OrderID string  `json:"order_id"`
@@ -181,7 +192,7 @@ func signData(data []byte, privateKey crypto.PrivateKey) ([]byte, error) {
 }
 
 // Запрос кодов маркировки из API Честного ЗНАКа
-func requestKIZs(ctx context.Context, requestData KIZRequestData) (KIZResponse, error) {
+func requestKIZs(ctx context.Context, requestData KIZRequestData, telegramID int64) (KIZResponse, error) {
 	privateKey, err := loadPrivateKey(config.PrivateKeyPath)
 	if err != nil {
 		log.Printf("Ошибка загрузки ключа: %v", err)
@@ -234,7 +245,7 @@ func requestKIZs(ctx context.Context, requestData KIZRequestData) (KIZResponse,
 	}
 
 	// Генерация файлов с кодами маркировки
-	filePaths, err := generateKIZFiles(result.KIZs)
+	filePaths, err := generateKIZFiles(result.KIZs, telegramID)
 	if err != nil {
 		log.Printf("Ошибка генерации файлов: %v", err)
 		// Продолжаем работу, так как основные данные получены
@@ -244,21 +255,32 @@ func requestKIZs(ctx context.Context, requestData KIZRequestData) (KIZResponse,
 	return result, nil
 }
 
+// Префикс имени файла с кодами маркировки, по которому определяется владелец файла
+func kizFilePrefix(telegramID int64) string {
+	return fmt.Sprintf("kizs_%d_", telegramID)
+}
+
 // Генерация файлов с кодами маркировки
-func generateKIZFiles(kizs []string) ([]string, error) {
+func generateKIZFiles(kizs []string, telegramID int64) ([]string, error) {
 	if len(kizs) == 0 {
 		return nil, nil
 	}
 
 	// Создание директории для временных файлов, если не существует
-	tempDir := "./temp"
-	if err := os.MkdirAll(tempDir, 0755); err != nil {
+	if err := os.MkdirAll(kizFilesDir, 0755); err != nil {
 		return nil, fmt.Errorf("ошибка создания директории: %w", err)
 	}
 
+	// Случайная часть имени не дает подобрать чужой файл и исключает совпадение имен
+	// у запросов, пришедших в одну секунду
+	token := make([]byte, 16)
+	if _, err := rand.Read(token); err != nil {
+		return nil, fmt.Errorf("ошибка генерации имени файла: %w", err)
+	}
+
 	// Генерация PDF-файла
 	timestamp := time.Now().Format("20060102-150405")
-	filename := filepath.Join(tempDir, fmt.Sprintf("kizs_%s.pdf", timestamp))
+	filename := filepath.Join(kizFilesDir, fmt.Sprintf("%s%s_%x.pdf", kizFilePrefix(telegramID), timestamp, token))
 
 	if err := generatePDF(kizs, filename); err != nil {
 		return nil, fmt.Errorf("ошибка создания PDF: %w", err)
@@ -267,6 +289,24 @@ func generateKIZFiles(kizs []string) ([]string, error) {
 	return []string{filename}, nil
 }
 
+// Замена полного списка кодов маркировки на количество, первые коды и ссылку на файл
+func summarizeKIZResponse(response KIZResponse, previewLimit int) KIZResponse {
+	response.Count = len(response.KIZs)
+	if previewLimit > len(response.KIZs) {
+		previewLimit = len(response.KIZs)
+	}
+	response.Preview = response.KIZs[:previewLimit]
+	response.KIZs = nil
+
+	// Локальные пути сервера клиенту не нужны: вместо них отдается ссылка на файл
+	if len(response.FilePaths) > 0 {
+		response.FileURL = kizFilesPath + filepath.Base(response.FilePaths[0])
+	}
+	response.FilePaths = nil
+
+	return response
+}
+
 // Генерация PDF-файла со списком кодов маркировки
 func generatePDF(kizs []string, filename string) error {
 	pdf := gofpdf.New("P", "mm", "A4", "")
@@ -383,12 +423,17 @@ func handleKIZRequest(w http.ResponseWriter, r *http.Request) {
 		data.INN, len(data.GTINData), telegramID)
 
 	// Запрос кодов маркировки
-	response, err := requestKIZs(r.Context(), data)
+	response, err := requestKIZs(r.Context(), data, telegramID)
 	if err != nil {
 		log.Printf("Ошибка при запросе КИЗ: %v", err)
 		// Продолжаем выполнение, так как в response уже содержится информация об ошибке
 	}
 
+	// Клиент запросил только сводку: полный список доступен по ссылке на файл
+	if data.PreviewLimit > 0 {
+		response = summarizeKIZResponse(response, data.PreviewLimit)
+	}
+
 	// Отправка ответа
 	w.Header().Set("Content-Type", "application/json")
 	if err := json.NewEncoder(w).Encode(response); err != nil {
@@ -398,6 +443,36 @@ func handleKIZRequest(w http.ResponseWriter, r *http.Request) {
 	}
 }
 
+// Обработчик HTTP-запросов для скачивания файла с кодами маркировки
+func handleKIZFileRequest(w http.ResponseWriter, r *http.Request) {
+	// Проверка метода запроса
+	if r.Method != http.MethodGet {
+		http.Error(w, "Метод не поддерживается", http.StatusMethodNotAllowed)
+		return
+	}
+
+	// Файл выдается только пользователю, для которого он был сформирован
+	telegramID, err := strconv.ParseInt(r.URL.Query().Get("telegram_id"), 10, 64)
+	if err != nil || telegramID <= 0 {
+		http.Error(w, "Некорректный идентификатор пользователя", http.StatusBadRequest)
+		return
+	}
+
+	// Допускается только имя файла без пути, чтобы нельзя было выйти за пределы kizFilesDir
+	name := strings.TrimPrefix(r.URL.Path, kizFilesPath)
+	if name == "" || name != filepath.Base(name) || name == "." || name == ".." {
+		http.Error(w, "Некорректное имя файла", http.StatusBadRequest)
+		return
+	}
+
+	if !strings.HasPrefix(name, kizFilePrefix(telegramID)) {
+		http.NotFound(w, r)
+		return
+	}
+
+	http.ServeFile(w, r, filepath.Join(kizFilesDir, name))
+}
+
 // Обработчик HTTP-запросов для создания платежа
 func handlePaymentRequest(w http.ResponseWriter, r *http.Request) {
 	// Проверка метода запроса
@@ -475,6 +550,7 @@ func main() {
 
 	// Регистрация обработчиков - эндпоинты API v1
 	mux.HandleFunc("/api/v1/kizs", handleKIZRequest)
+	mux.HandleFunc(kizFilesPath, handleKIZFileRequest)
 	mux.HandleFunc("/api/v1/payments", handlePaymentRequest)
 
 	// Дополнительные эндпоинты для обратной совместимости с Python клиентом
@@ -504,7 +580,7 @@ func main() {
 	}
 
 	// Создание директории для временных файлов
-	if err := os.MkdirAll("./temp", 0755); err != nil {
+	if err := os.MkdirAll(kizFilesDir, 0755); err != nil {
 		log.Printf("Ошибка создания директории для временных файлов: %v", err)
 	}
 
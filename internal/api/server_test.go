@@ -0,0 +1,124 @@
+package main
+
+import (
+	"net/http"
+	"net/http/httptest"
+	"os"
+	"path/filepath"
+	"testing"
+)
+
+// Создает файл с кодами маркировки в kizFilesDir и удаляет его после теста
+func createKIZFile(t *testing.T, name, content string) {
+	t.Helper()
+
+	_, statErr := os.Stat(kizFilesDir)
+	if err := os.MkdirAll(kizFilesDir, 0755); err != nil {
+		t.Fatalf("Ошибка создания директории: %v", err)
+	}
+
+	path := filepath.Join(kizFilesDir, name)
+	if err := os.WriteFile(path, []byte(content), 0644); err != nil {
+		t.Fatalf("Ошибка записи файла: %v", err)
+	}
+
+	t.Cleanup(func() {
+		os.Remove(path)
+		// Удаляем директорию, только если ее создал тест
+		if os.IsNotExist(statErr) {
+			os.Remove(kizFilesDir)
+		}
+	})
+}
+
+func TestHandleKIZFileRequest(t *testing.T) {
+	const ownerFile = "kizs_42_20260101-000000_0123456789abcdef.pdf"
+	createKIZFile(t, ownerFile, "pdf-content")
+
+	tests := []struct {
+		name       string
+		target     string
+		wantStatus int
+	}{
+		{"без telegram_id", kizFilesPath + ownerFile, http.StatusBadRequest},
+		{"нечисловой telegram_id", kizFilesPath + ownerFile + "?telegram_id=abc", http.StatusBadRequest},
+		{"выход из каталога", kizFilesPath + "..?telegram_id=42", http.StatusBadRequest},
+		{"имя с путем", kizFilesPath + "a/b?telegram_id=42", http.StatusBadRequest},
+		{"пустое имя", kizFilesPath + "?telegram_id=42", http.StatusBadRequest},
+		{"чужой пользователь", kizFilesPath + ownerFile + "?telegram_id=7", http.StatusNotFound},
+		{"пользователь с совпадающим началом ID", kizFilesPath + ownerFile + "?telegram_id=4", http.StatusNotFound},
+		{"владелец файла", kizFilesPath + ownerFile + "?telegram_id=42", http.StatusOK},
+	}
+
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			req := httptest.NewRequest(http.MethodGet, tt.target, nil)
+			rec := httptest.NewRecorder()
+
+			handleKIZFileRequest(rec, req)
+
+			if rec.Code != tt.wantStatus {
+				t.Errorf("Ожидался статус %d, получен %d", tt.wantStatus, rec.Code)
+			}
+			if tt.wantStatus == http.StatusOK && rec.Body.String() != "pdf-content" {
+				t.Errorf("Ожидалось содержимое файла, получено %q", rec.Body.String())
+			}
+		})
+	}
+}
+
+func TestHandleKIZFileRequestMethod(t *testing.T) {
+	req := httptest.NewRequest(http.MethodPost, kizFilesPath+"kizs_42_x.pdf?telegram_id=42", nil)
+	rec := httptest.NewRecorder()
+
+	handleKIZFileRequest(rec, req)
+
+	if rec.Code != http.StatusMethodNotAllowed {
+		t.Errorf("Ожидался статус %d, получен %d", http.StatusMethodNotAllowed, rec.Code)
+	}
+}
+
+func TestSummarizeKIZResponse(t *testing.T) {
+	response := KIZResponse{
+		Status:    "success",
+		KIZs:      []string{"KIZ1", "KIZ2", "KIZ3"},
+		FilePaths: []string{filepath.Join(kizFilesDir, "kizs_42_20260101-000000_abcd.pdf")},
+	}
+
+	summary := summarizeKIZResponse(response, 2)
+
+	if summary.Count != 3 {
+		t.Errorf("Ожидалось количество 3, получено %d", summary.Count)
+	}
+	if len(summary.Preview) != 2 || summary.Preview[0] != "KIZ1" || summary.Preview[1] != "KIZ2" {
+		t.Errorf("Ожидались первые 2 КИЗ, получено %v", summary.Preview)
+	}
+	if summary.KIZs != nil {
+		t.Errorf("Ожидался пустой список КИЗ, получено %v", summary.KIZs)
+	}
+	if summary.FilePaths != nil {
+		t.Errorf("Ожидались пустые пути к файлам, получено %v", summary.FilePaths)
+	}
+	if want := kizFilesPath + "kizs_42_20260101-000000_abcd.pdf"; summary.FileURL != want {
+		t.Errorf("Ожидалась ссылка %s, получена %s", want, summary.FileURL)
+	}
+}
+
+func TestSummarizeKIZResponseLimitAboveCount(t *testing.T) {
+	response := KIZResponse{KIZs: []string{"KIZ1", "KIZ2"}}
+
+	summary := summarizeKIZResponse(response, 10)
+
+	if summary.Count != 2 {
+		t.Errorf("Ожидалось количество 2, получено %d", summary.Count)
+	}
+	if len(summary.Preview) != 2 {
+		t.Errorf("Ожидалось 2 КИЗ в превью, получено %d", len(summary.Preview))
+	}
+	if summary.KIZs != nil {
+		t.Errorf("Ожидался пустой список КИЗ, получено %v", summary.KIZs)
+	}
+	if summary.FileURL != "" {
+		t.Errorf("Ожидалась пустая ссылка на файл, получена %s", summary.FileURL)
+	}
+}
@@ -1,13 +1,27 @@
+import asyncio
 import logging
-import psycopg2  # type: ignore
+from contextlib import asynccontextmanager
+import psycopg  # type: ignore
+from psycopg_pool import AsyncConnectionPool, PoolTimeout  # type: ignore
 from reportlab.lib.pagesizes import letter  # type: ignore
+from reportlab.pdfbase import pdfmetrics  # type: ignore
 from reportlab.pdfgen import canvas  # type: ignore
 from telegram import Update  # type: ignore
-from telegram.ext import Updater, CommandHandler, CallbackContext  # type: ignore
-import requests  # type: ignore
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, ContextTypes  # type: ignore
+import httpx  # type: ignore
+from aiobreaker import CircuitBreaker, CircuitBreakerError  # type: ignore
+from cachetools import TTLCache  # type: ignore
+from redis.asyncio import Redis  # type: ignore
+from redis.asyncio.retry import Retry  # type: ignore
+from redis.backoff import NoBackoff  # type: ignore
+from redis.exceptions import RedisError  # type: ignore
 import os
-import json
-from typing import List, Dict, Optional, Any, Union
+import functools
+from types import SimpleNamespace
+import orjson
+import time
+from datetime import timedelta
+from typing import List, Dict, Optional, Any, Union, Tuple, AsyncIterator
 
 # Настройка логирования
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
@@ -22,218 +36,539 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT', '5432')
 }
 
-# URL Go-сервиса
-GO_SERVICE_URL = os.getenv('GO_SERVICE_URL', "http://localhost:8080")
+@functools.cache
+def get_config() -> SimpleNamespace:
+    #"""Читает настройки бота из переменных окружения один раз за время работы процесса."""
+    return SimpleNamespace(
+        db=DB_CONFIG,
+        token=os.getenv('TELEGRAM_BOT_TOKEN'),
+        go_url=os.getenv('GO_SERVICE_URL', "http://localhost:8080")
+    )
+
+# Эндпоинты Go-сервиса
 API_KIZS_ENDPOINT = "/api/v1/kizs"  # Обновленный эндпоинт в соответствии с Go-сервисом
 API_PAYMENTS_ENDPOINT = "/api/v1/payments"  # Обновленный эндпоинт
 
-def create_connection():
-    #"""Создает соединение с базой данных PostgreSQL."""
+# Параметры клиента Telegram Bot API.
+# Число одновременно обрабатываемых обновлений не должно превышать DB_POOL_MAX_CONN,
+# иначе обработчики будут простаивать в ожидании соединения с БД.
+TELEGRAM_CONCURRENT_UPDATES = 16
+TELEGRAM_CONNECTION_POOL_SIZE = 32
+TELEGRAM_POOL_TIMEOUT = 10  # секунд
+TELEGRAM_READ_TIMEOUT = 15  # секунд
+TELEGRAM_CONNECT_TIMEOUT = 7  # секунд
+
+# Redis — общий кэш ссылок на оплату для нескольких экземпляров бота
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
+REDIS_SOCKET_TIMEOUT = 0.5  # секунд; при недоступности кэша запросы идут напрямую в Go-сервис
+PAYMENT_REDIS_TTL = 900  # секунд
+
+# Пул keep-alive соединений к Go-сервису
+HTTP_MAX_CONNECTIONS = 50
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Кэш ссылок на оплату для повторных /pay с теми же параметрами
+PAYMENT_CACHE_MAXSIZE = 10_000
+PAYMENT_CACHE_TTL = 300  # секунд
+payment_cache: TTLCache = TTLCache(maxsize=PAYMENT_CACHE_MAXSIZE, ttl=PAYMENT_CACHE_TTL)
+
+# Параметры разметки PDF
+PDF_FONT_NAME = "Helvetica"
+PDF_FONT_SIZE = 12
+PDF_LEFT_MARGIN = 100
+PDF_LINE_HEIGHT = 20
+PDF_BOTTOM_MARGIN = 40
+
+# Метрики шрифта загружаются один раз при импорте, а не при генерации первого PDF
+pdfmetrics.getFont(PDF_FONT_NAME)
+
+# Количество КИЗ, которое Go-сервис возвращает в ответе; полный список доступен файлом по /getfile
+KIZ_PREVIEW_LIMIT = 10
+
+# orjson сериализует только 64-битные целые, поэтому количество КИЗ ограничено сверху
+KIZ_MAX_COUNT = 2**63 - 1
+
+# Размыкатель цепи для Go-сервиса: после серии ошибок запросы сразу отклоняются
+GO_BREAKER_FAIL_MAX = 5
+GO_BREAKER_RESET_TIMEOUT = timedelta(seconds=30)
+
+def _is_client_error(error: Exception) -> bool:
+    #"""Ответы 4xx (кроме 429) означают ошибку в запросе, а не сбой Go-сервиса."""
+    return (
+        isinstance(error, httpx.HTTPStatusError)
+        and error.response.status_code < 500
+        and error.response.status_code != 429
+    )
+
+go_breaker = CircuitBreaker(
+    fail_max=GO_BREAKER_FAIL_MAX,
+    timeout_duration=GO_BREAKER_RESET_TIMEOUT,
+    exclude=[_is_client_error]
+)
+
+# Повторные попытки при временных сбоях Go-сервиса
+GO_RETRY_ATTEMPTS = 3
+GO_RETRY_BACKOFF_FACTOR = 0.3  # секунд; задержка удваивается с каждой попыткой
+GO_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Запрос КИЗ выпускает коды: после 502/504 от прокси они могли быть уже выпущены,
+# поэтому повторяем только ответы, при которых запрос точно не был обработан
+GO_RETRY_STATUSES_BY_PATH = {API_KIZS_ENDPOINT: frozenset({429, 503})}
+GO_REQUEST_DEADLINE = 45  # секунд на все попытки одного запроса
+
+# Пул соединений с БД (открывается при запуске бота и хранится в bot_data["pg_pool"])
+DB_POOL_MIN_CONN = 4
+DB_POOL_MAX_CONN = 16
+DB_POOL_OPEN_TIMEOUT = 10  # секунд на установку начальных соединений
+DB_PREPARE_THRESHOLD = 1  # Серверная подготовка повторяющихся запросов со второго выполнения
+
+async def _warm_up_pool(pool: AsyncConnectionPool) -> None:
+    #"""Дожидается установки минимального числа соединений, не закрывая пул при неудаче."""
+    # pool.open(wait=True) закрывает пул по таймауту, поэтому соединения берутся и возвращаются вручную
+    deadline = time.monotonic() + DB_POOL_OPEN_TIMEOUT
+    connections = []
+    try:
+        for _ in range(DB_POOL_MIN_CONN):
+            connections.append(await pool.getconn(timeout=max(deadline - time.monotonic(), 0.1)))
+    except PoolTimeout as e:
+        # Пул продолжит подключаться в фоне, первые запросы дождутся соединений
+        logger.error("Не удалось заранее открыть соединения с БД: %s", e)
+    finally:
+        for conn in connections:
+            await pool.putconn(conn)
+
+async def init_pool() -> Optional[AsyncConnectionPool]:
+    #"""Создает пул соединений с PostgreSQL и заранее открывает минимальное число соединений."""
+    try:
+        pool = AsyncConnectionPool(
+            min_size=DB_POOL_MIN_CONN,
+            max_size=DB_POOL_MAX_CONN,
+            kwargs={**get_config().db, 'prepare_threshold': DB_PREPARE_THRESHOLD},
+            open=False
+        )
+        await pool.open()
+    except psycopg.Error as e:
+        logger.error("Ошибка подключения к БД: %s", e)
+        return None
+    await _warm_up_pool(pool)
+    return pool
+
+@asynccontextmanager
+async def create_connection(pool: Optional[AsyncConnectionPool]) -> AsyncIterator[Optional[Any]]:
+    #"""Выдает соединение из пула и возвращает его обратно после использования."""
+    if pool is None:
+        yield None
+        return
+    try:
+        conn = await pool.getconn()
+    except psycopg.Error as e:
+        logger.error("Ошибка подключения к БД: %s", e)
+        yield None
+        return
+    try:
+        yield conn
+    finally:
+        await pool.putconn(conn)
+
+def create_http_client() -> httpx.AsyncClient:
+    #"""Создает HTTP-клиент с пулом keep-alive соединений к Go-сервису."""
+    return httpx.AsyncClient(
+        base_url=get_config().go_url,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+        )
+    )
+
+def _is_retryable(error: httpx.HTTPError, path: str) -> bool:
+    #"""Проверяет, является ли ошибка запроса временной и безопасной для повтора."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in GO_RETRY_STATUSES_BY_PATH.get(path, GO_RETRY_STATUSES)
+    # Повторяем только запросы, которые не дошли до сервиса
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+@go_breaker
+async def _post_go(client: httpx.AsyncClient, path: str, *, timeout: float, **kwargs: Any) -> httpx.Response:
+    #"""Отправляет POST-запрос в Go-сервис через размыкатель цепи с повторами при временных сбоях."""
+    deadline = time.monotonic() + GO_REQUEST_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            response = await client.post(path, timeout=min(timeout, deadline - time.monotonic()), **kwargs)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            delay = GO_RETRY_BACKOFF_FACTOR * 2 ** attempt
+            if attempt >= GO_RETRY_ATTEMPTS or not _is_retryable(e, path) or time.monotonic() + delay >= deadline:
+                raise
+            attempt += 1
+            logger.warning("Повтор запроса к Go-сервису (%d/%d) через %.1f с: %s", attempt, GO_RETRY_ATTEMPTS, delay, e)
+            await asyncio.sleep(delay)
+
+async def _call_go(
+    client: httpx.AsyncClient,
+    path: str,
+    *,
+    body: Dict[str, Any],
+    params: Dict[str, Any],
+    timeout: float
+) -> Dict[str, Any]:
+    #"""Выполняет JSON-запрос к Go-сервису и возвращает декодированный ответ; ошибки пробрасываются вызывающему."""
+    response = await _post_go(
+        client,
+        path,
+        content=orjson.dumps(body),
+        headers=JSON_HEADERS,
+        params=params,
+        timeout=timeout
+    )
+    return orjson.loads(response.content)
+
+def create_redis_client() -> Redis:
+    #"""Создает клиент Redis без повторных попыток, чтобы сбой кэша не задерживал ответ."""
+    return Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        decode_responses=True,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        retry=Retry(NoBackoff(), 0)
+    )
+
+async def redis_get(redis_client: Optional[Redis], key: str) -> Optional[str]:
+    #"""Читает значение из общего кэша; недоступность Redis не считается ошибкой запроса."""
+    if redis_client is None:
+        return None
     try:
-        return psycopg2.connect(**DB_CONFIG)
-    except psycopg2.Error as e:
-        logger.error(f"Ошибка подключения к БД: {e}")
+        return await redis_client.get(key)
+    except RedisError as e:
+        logger.error("Ошибка чтения из Redis: %s", e)
         return None
 
+async def redis_set(redis_client: Optional[Redis], key: str, value: str, ttl: int) -> None:
+    #"""Записывает значение в общий кэш, если ключ еще не занят."""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(key, value, ex=ttl, nx=True)
+    except RedisError as e:
+        logger.error("Ошибка записи в Redis: %s", e)
+
+def payment_cache_key(amount: float, order_id: str, telegram_id: int) -> str:
+    #"""Формирует ключ кэша для ссылки на оплату."""
+    return f"pay:{order_id}:{amount:.2f}:{telegram_id}"
+
 def generate_pdf(gtin_data: List[str], filename: str) -> None:
    #"""Генерирует PDF-файл со списком GTIN."""
     try:
         c = canvas.Canvas(filename, pagesize=letter)
         width, height = letter
-        for index, gtin in enumerate(gtin_data):
-            c.drawString(100, height - (index + 1) * 20, f"GTIN: {gtin}")
+        # Число строк на странице считается один раз, а не проверяется на каждой строке;
+        # все строки страницы выводятся одним текстовым объектом
+        lines_per_page = int((height - PDF_LINE_HEIGHT - PDF_BOTTOM_MARGIN) // PDF_LINE_HEIGHT) + 1
+        for start in range(0, max(len(gtin_data), 1), lines_per_page):
+            if start:
+                c.showPage()
+            text = c.beginText(PDF_LEFT_MARGIN, height - PDF_LINE_HEIGHT)
+            text.setFont(PDF_FONT_NAME, PDF_FONT_SIZE, leading=PDF_LINE_HEIGHT)
+            for gtin in gtin_data[start:start + lines_per_page]:
+                text.textLine(f"GTIN: {gtin}")
+            c.drawText(text)
         c.save()
-        logger.info(f"PDF-файл успешно создан: {filename}")
+        logger.info("PDF-файл успешно создан: %s", filename)
     except Exception as e:
-        logger.error(f"Ошибка при генерации PDF: {e}")
+        logger.error("Ошибка при генерации PDF: %s", e)
         raise
 
-def add_user(username: str, email: str, price: float) -> bool:
+async def add_user(pool: Optional[AsyncConnectionPool], username: str, email: str, price: float) -> bool:
     #"""Добавляет пользователя в базу данных."""
-    conn = create_connection()
-    if conn is None:
-        return False
-    
-    try:
-        with conn:
-            with conn.cursor() as cursor:
-                cursor.execute(
+    async with create_connection(pool) as conn:
+        if conn is None:
+            return False
+
+        try:
+            async with conn.transaction():
+                await conn.execute(
                     'INSERT INTO users (username, email, price) VALUES (%s, %s, %s)',
                     (username, email, price)
                 )
-            conn.commit()
-            logger.info(f"Пользователь {username} успешно добавлен")
+            logger.info("Пользователь %s успешно добавлен", username)
             return True
-    except psycopg2.Error as e:
-        logger.error(f"Ошибка при добавлении пользователя: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        except psycopg.Error as e:
+            logger.error("Ошибка при добавлении пользователя: %s", e)
+            return False
+
+async def add_users_bulk(pool: Optional[AsyncConnectionPool], rows: List[Tuple[str, str, float]]) -> bool:
+    #"""Добавляет пачку пользователей в базу данных одной командой COPY."""
+    if not rows:
+        return True
 
-def create_payment(amount: float, order_id: str, telegram_id: int) -> Optional[str]:
+    async with create_connection(pool) as conn:
+        if conn is None:
+            return False
+
+        try:
+            async with conn.transaction():
+                async with conn.cursor() as cursor:
+                    async with cursor.copy('COPY users (username, email, price) FROM STDIN') as copy:
+                        for row in rows:
+                            await copy.write_row(row)
+            logger.info("Добавлено пользователей: %d", len(rows))
+            return True
+        except psycopg.Error as e:
+            logger.error("Ошибка при пакетном добавлении пользователей: %s", e)
+            return False
+
+async def create_payment(
+    client: httpx.AsyncClient,
+    amount: float,
+    order_id: str,
+    telegram_id: int,
+    redis_client: Optional[Redis] = None
+) -> Optional[str]:
     #"""Создает платеж через Go-сервис и возвращает URL для оплаты."""
-    data = {"amount": amount, "order_id": order_id}
+    cache_key = (order_id, round(amount, 2), telegram_id)
+    cached_url = payment_cache.get(cache_key)
+    if cached_url is not None:
+        return cached_url
+
+    redis_key = payment_cache_key(amount, order_id, telegram_id)
+    cached_url = await redis_get(redis_client, redis_key)
+    if cached_url is not None:
+        payment_cache[cache_key] = cached_url
+        return cached_url
+
     try:
-        response = requests.post(
-            f"{GO_SERVICE_URL}{API_PAYMENTS_ENDPOINT}",
-            json=data,
+        result = await _call_go(
+            client,
+            API_PAYMENTS_ENDPOINT,
+            body={"amount": amount, "order_id": order_id},
             params={"telegram_id": telegram_id},
-            timeout=10  # Добавлен таймаут
+            timeout=10
         )
-        response.raise_for_status()
-        result = response.json()
         
         if result.get("status") == "success":
-            return result.get("payment_url")
+            payment_url = result.get("payment_url")
+            if payment_url:
+                payment_cache[cache_key] = payment_url
+                await redis_set(redis_client, redis_key, payment_url, PAYMENT_REDIS_TTL)
+            return payment_url
         else:
-            logger.error(f"Ошибка Robokassa: {result.get('message')}")
+            logger.error("Ошибка Robokassa: %s", result.get('message'))
             return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка запроса к сервису платежей: {e}")
+    except httpx.HTTPError as e:
+        logger.error("Ошибка запроса к сервису платежей: %s", e)
         return None
-    except json.JSONDecodeError as e:
-        logger.error(f"Ошибка декодирования JSON ответа: {e}")
+    except orjson.JSONDecodeError as e:
+        logger.error("Ошибка декодирования JSON ответа: %s", e)
         return None
 
-def request_kiz_command(update: Update, context: CallbackContext) -> None:
+async def getfile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    #"""Обрабатывает команду /getfile: отправляет файл с полным списком КИЗ из последнего запроса."""
+    file_url = context.user_data.get("kiz_file_url")
+    if not file_url:
+        await update.message.reply_text("Нет файла для отправки. Сначала запросите КИЗы командой /requestkiz.")
+        return
+
+    try:
+        response = await context.application.bot_data["http"].get(
+            file_url,
+            params={"telegram_id": update.effective_user.id},
+            timeout=30
+        )
+        response.raise_for_status()
+        await update.message.reply_document(response.content, filename=os.path.basename(file_url))
+    except httpx.HTTPError as e:
+        logger.error("Ошибка получения файла КИЗ: %s", e)
+        await update.message.reply_text("⚠️ Не удалось получить файл. Возможно, он уже удален, запросите КИЗы повторно.")
+
+async def request_kiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     #"""Обрабатывает команду /requestkiz для запроса КИЗ."""
     if len(context.args) < 2:
-        update.message.reply_text("Используйте: /requestkiz <gtin1> <кол-во1> [<gtin2> <кол-во2>...] [inn <ИНН>]")
+        await update.message.reply_text("Используйте: /requestkiz <gtin1> <кол-во1> [<gtin2> <кол-во2>...] [inn <ИНН>]")
         return
 
-    # Парсинг аргументов
-    gtin_data = []
+    # Парсинг аргументов: сначала извлекаем все пары "inn <ИНН>" (действует последняя),
+    # остаток разбираем парами <gtin> <кол-во>
+    args = []
     inn = ""
     telegram_id = update.effective_user.id
 
-    i = 0
-    while i < len(context.args):
-        if context.args[i].lower() == "inn" and i + 1 < len(context.args):
-            inn = context.args[i+1]
-            i += 2
-            continue
-        try:
-            gtin, count = context.args[i], int(context.args[i+1])
-            gtin_data.append({"gtin": gtin, "count": count})
-            i += 2
-        except (ValueError, IndexError):
-            update.message.reply_text("Некорректный формат аргументов.")
-            return
+    arg_iter = iter(context.args)
+    for arg in arg_iter:
+        if arg.lower() == "inn":
+            # "inn" без значения в конце оставляет ИНН пустым и дает отдельное сообщение ниже
+            inn = next(arg_iter, "")
+        else:
+            args.append(arg)
+
+    if len(args) % 2:
+        await update.message.reply_text("Некорректный формат аргументов.")
+        return
+
+    try:
+        it = iter(args)
+        gtin_data = [{"gtin": gtin, "count": int(count)} for gtin, count in zip(it, it)]
+    except ValueError:
+        await update.message.reply_text("Некорректный формат аргументов.")
+        return
+    if any(not 0 < item["count"] <= KIZ_MAX_COUNT for item in gtin_data):
+        await update.message.reply_text("Некорректный формат аргументов.")
+        return
 
     # Проверка наличия данных
     if not gtin_data:
-        update.message.reply_text("Необходимо указать хотя бы один GTIN с количеством.")
+        await update.message.reply_text("Необходимо указать хотя бы один GTIN с количеством.")
         return
     
     if not inn:
-        update.message.reply_text("Необходимо указать ИНН (inn <номер>).")
+        await update.message.reply_text("Необходимо указать ИНН (inn <номер>).")
         return
 
-    # Отправка запроса в Go-сервис
+    # Отправка запроса в Go-сервис: каждый запрос выпускает новые КИЗ, поэтому ответы не кэшируются
     try:
-        response = requests.post(
-            f"{GO_SERVICE_URL}{API_KIZS_ENDPOINT}",
-            json={"gtin_data": gtin_data, "inn": inn},
+        result = await _call_go(
+            context.application.bot_data["http"],
+            API_KIZS_ENDPOINT,
+            body={"gtin_data": gtin_data, "inn": inn, "preview_limit": KIZ_PREVIEW_LIMIT},
             params={"telegram_id": telegram_id},
             timeout=30  # Увеличенный таймаут для запроса КИЗ
         )
-        response.raise_for_status()
-        result = response.json()
         
         if result.get("status") == "success":
             message = result.get("message", "✅ КИЗы получены")
             
-            # Добавляем информацию о КИЗах в сообщение
-            if "kizs" in result and result["kizs"]:
-                kizs_list = result["kizs"]
-                if len(kizs_list) > 10:
-                    # Если список слишком длинный, показываем только первые 10 элементов
-                    message += f"\nПолучено {len(kizs_list)} КИЗов. Первые 10:\n" + "\n".join(kizs_list[:10]) + "\n..."
-                else:
-                    message += "\nСписок КИЗ:\n" + "\n".join(kizs_list)
+            # Go-сервис возвращает только количество и первые КИЗы, полный список — по ссылке на файл
+            preview = result.get("preview") or []
+            count = result.get("count", len(preview))
+            if count > len(preview):
+                message += (
+                    f"\nПолучено {count} КИЗов. Первые {len(preview)}:\n"
+                    + "\n".join(preview) + "\n..."
+                )
+            elif preview:
+                message += "\nСписок КИЗ:\n" + "\n".join(preview)
             
-            # Добавляем информацию о файлах
-            if "file_paths" in result and result["file_paths"]:
-                message += "\nФайлы: " + ", ".join(result["file_paths"])
+            # Запоминаем ссылку на файл для команды /getfile
+            if result.get("file_url"):
+                context.user_data["kiz_file_url"] = result["file_url"]
+                message += "\nПолный список в PDF: /getfile"
             
-            update.message.reply_text(message)
+            await update.message.reply_text(message)
         else:
-            update.message.reply_text(f"❌ Ошибка: {result.get('message', 'Неизвестная ошибка')}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка запроса КИЗ: {e}")
-        update.message.reply_text(f"🚫 Ошибка связи с сервером: {str(e)}")
-    except json.JSONDecodeError as e:
-        logger.error(f"Ошибка декодирования JSON ответа: {e}")
-        update.message.reply_text("⚠️ Ошибка формата ответа сервера")
+            await update.message.reply_text(f"❌ Ошибка: {result.get('message', 'Неизвестная ошибка')}")
+    except CircuitBreakerError:
+        await update.message.reply_text("🚫 Сервис временно недоступен. Пожалуйста, попробуйте позже.")
+    except httpx.HTTPError as e:
+        logger.error("Ошибка запроса КИЗ: %s", e)
+        await update.message.reply_text(f"🚫 Ошибка связи с сервером: {str(e)}")
+    except orjson.JSONDecodeError as e:
+        logger.error("Ошибка декодирования JSON ответа: %s", e)
+        await update.message.reply_text("⚠️ Ошибка формата ответа сервера")
     except Exception as e:
-        logger.error(f"Непредвиденная ошибка: {e}")
-        update.message.reply_text(f"⚠️ Произошла ошибка: {str(e)}")
+        logger.error("Непредвиденная ошибка: %s", e)
+        await update.message.reply_text(f"⚠️ Произошла ошибка: {str(e)}")
 
-def start(update: Update, context: CallbackContext) -> None:
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     #"""Обрабатывает команду /start."""
     user = update.effective_user
-    update.message.reply_text(
+    await update.message.reply_text(
         f"👋 Здравствуйте, {user.first_name}!\n\n"
         "Я бот для работы с Честным ЗНАКом. Доступные команды:\n"
         "/requestkiz - запросить КИЗы\n"
+        "/getfile - получить файл с КИЗами из последнего запроса\n"
         "/pay - создать платеж"
     )
 
-def pay_command(update: Update, context: CallbackContext) -> None:
+async def pay_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     #"""Обрабатывает команду /pay для создания платежа."""
     if not context.args or len(context.args) < 2:
-        update.message.reply_text("Используйте: /pay <сумма> <ID заказа>")
+        await update.message.reply_text("Используйте: /pay <сумма> <ID заказа>")
         return
 
     try:
         amount = float(context.args[0])
         if amount <= 0:
-            update.message.reply_text("⚠️ Сумма должна быть положительным числом")
+            await update.message.reply_text("⚠️ Сумма должна быть положительным числом")
             return
             
         order_id = context.args[1]
         telegram_id = update.effective_user.id
         
-        update.message.reply_text("⏳ Создание платежа...")
+        await update.message.reply_text("⏳ Создание платежа...")
         
-        payment_url = create_payment(amount, order_id, telegram_id)
+        payment_url = await create_payment(
+            context.application.bot_data["http"],
+            amount,
+            order_id,
+            telegram_id,
+            context.application.bot_data.get("redis")
+        )
         if payment_url:
-            update.message.reply_text(f"🔗 Ссылка для оплаты: {payment_url}")
+            await update.message.reply_text(f"🔗 Ссылка для оплаты: {payment_url}")
         else:
-            update.message.reply_text("⚠️ Не удалось создать платеж. Пожалуйста, попробуйте позже.")
+            await update.message.reply_text("⚠️ Не удалось создать платеж. Пожалуйста, попробуйте позже.")
+    except CircuitBreakerError:
+        await update.message.reply_text("🚫 Сервис временно недоступен. Пожалуйста, попробуйте позже.")
     except ValueError:
-        update.message.reply_text("⚠️ Сумма должна быть числом. Пример: /pay 100.50 order123")
+        await update.message.reply_text("⚠️ Сумма должна быть числом. Пример: /pay 100.50 order123")
     except IndexError:
-        update.message.reply_text("Используйте: /pay <сумма> <ID заказа>")
+        await update.message.reply_text("Используйте: /pay <сумма> <ID заказа>")
     except Exception as e:
-        logger.error(f"Ошибка в команде оплаты: {e}")
-        update.message.reply_text(f"⚠️ Произошла ошибка: {str(e)}")
+        logger.error("Ошибка в команде оплаты: %s", e)
+        await update.message.reply_text(f"⚠️ Произошла ошибка: {str(e)}")
+
+async def on_startup(application: Application) -> None:
+    #"""Открывает общие HTTP-клиент и пул соединений с БД перед запуском бота."""
+    application.bot_data["http"] = create_http_client()
+    application.bot_data["redis"] = create_redis_client()
+    application.bot_data["pg_pool"] = await init_pool()
+
+async def on_shutdown(application: Application) -> None:
+    #"""Закрывает HTTP-клиент и пул соединений с БД при остановке бота."""
+    client = application.bot_data.pop("http", None)
+    if client is not None:
+        await client.aclose()
+    redis_client = application.bot_data.pop("redis", None)
+    if redis_client is not None:
+        await redis_client.aclose()
+    pool = application.bot_data.pop("pg_pool", None)
+    if pool is not None:
+        await pool.close()
 
 def main() -> None:
     #"""Запускает бота."""
-    token = os.getenv('7653712411:AAEcbimjAVzEG0uQSOiPUr5OCs8EnhyEVL0')
+    token = get_config().token
     if not token:
-        logger.error("Не задан токен бота в переменных окружения 7653712411:AAEcbimjAVzEG0uQSOiPUr5OCs8EnhyEVL0")
+        logger.error("Не задан токен бота в переменной окружения TELEGRAM_BOT_TOKEN")
         return
         
     try:
-        updater = Updater(token)
-        dp = updater.dispatcher
+        application = (
+            ApplicationBuilder()
+            .token(token)
+            .concurrent_updates(TELEGRAM_CONCURRENT_UPDATES)  # Обработчики не ждут завершения друг друга
+            .connection_pool_size(TELEGRAM_CONNECTION_POOL_SIZE)
+            .pool_timeout(TELEGRAM_POOL_TIMEOUT)
+            .read_timeout(TELEGRAM_READ_TIMEOUT)
+            .connect_timeout(TELEGRAM_CONNECT_TIMEOUT)
+            .post_init(on_startup)
+            .post_shutdown(on_shutdown)
+            .build()
+        )
         
         # Регистрация обработчиков команд
-        dp.add_handler(CommandHandler("start", start))
-        dp.add_handler(CommandHandler("requestkiz", request_kiz_command))
-        dp.add_handler(CommandHandler("pay", pay_command))
+        application.add_handler(CommandHandler("start", start))
+        application.add_handler(CommandHandler("requestkiz", request_kiz_command))
+        application.add_handler(CommandHandler("getfile", getfile_command))
+        application.add_handler(CommandHandler("pay", pay_command))
         
-        # Запуск бота
-        updater.start_polling()
+        # Запуск бота и ожидание его остановки
         logger.info("Бот успешно запущен")
-        
-        # Ожидание остановки бота
-        updater.idle()
+        application.run_polling()
     except Exception as e:
-        logger.error(f"Ошибка запуска бота: {e}")
+        logger.error("Ошибка запуска бота: %s", e)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file